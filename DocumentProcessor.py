@@ -1,17 +1,223 @@
 import os
-import mimetypes
-import openai
+import asyncio
+import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
+import tiktoken
+from openai import AsyncOpenAI
 from unstructured.partition.auto import partition
 from unstructured.chunking.title import chunk_by_title
 from unstructured_client import UnstructuredClient
 from unstructured_client.models import shared
 from unstructured_client.models.errors import SDKError
 from unstructured.staging.base import dict_to_elements
+from utils import (DEFAULT_CACHE_DIR, elements_cache_path, load_cached_elements, pdf_partition_params, run_sync,
+                   save_cached_elements)
+
+# Per-element/per-chunk diagnostics go through this logger so they cost nothing unless
+# DEBUG logging is enabled; user-facing status messages are still printed.
+log = logging.getLogger(__name__)
+
+_PARAGRAPH_BREAK_RE = re.compile(r'\n\n')
+_WORD_END_RE = re.compile(r'(?<= )')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?]) +')
+
+# File extensions the processor distinguishes between; anything else is 'unknown'
+_EXT_MAP = {
+    '.pdf': 'pdf',
+    '.docx': 'docx',
+    '.txt': 'txt',
+    '.md': 'md',
+}
+
+# Tokenizer used by gpt-4o-mini, for sizing polishing chunks against the model's token budget
+_TOKEN_ENCODING_NAME = "o200k_base"
+
+# Output budget for one polishing request. Polished text is about as long as its input, so this is kept
+# well above split_markdown_into_chunks' max_chunk_size to leave headroom for the rewrite.
+POLISH_MAX_OUTPUT_TOKENS = 4096
+
+UNSTRUCTURED_SERVER_URL = "https://api.unstructuredapp.io/general/v0/general"
+
+# Unstructured clients shared by every processor using the same API key, so their
+# HTTPS connection pools (and TLS sessions) are reused across documents
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# Output is encoded and written in slices of this many characters through a buffer of the
+# same size, so the full UTF-8 encoding of a large document is never held in memory
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Base delay in seconds for exponential backoff on transient Unstructured API errors
+RETRY_BASE_DELAY = 1.0
+
+
+def _flatten_elements(elements):
+    """
+    Expands composite elements into their leaves, in document order, using an
+    explicit stack instead of recursion.
+
+    Args:
+        elements (list): The top-level elements.
+
+    Returns:
+        list: The single (non-composite) elements.
+    """
+    stack = list(reversed(elements))
+    flat = []
+    while stack:
+        element = stack.pop()
+        if not hasattr(element, 'category') and hasattr(element, 'elements'):
+            # Handle CompositeElement
+            stack.extend(reversed(element.elements))
+        else:
+            flat.append(element)
+    return flat
+
+
+def _element_to_markdown(element, file_path):
+    """
+    Converts a single (non-composite) element to Markdown format.
+
+    Args:
+        element: The element to convert.
+        file_path (str): Path of the source document, used for figure links.
+
+    Returns:
+        str: The Markdown representation of the element.
+    """
+    if not hasattr(element, 'category'):
+        log.debug("Unknown element type: %r", element)
+        return ""
+
+    element_type = element.category
+    text = element.text.strip() if element.text else ""
+
+    if not text:
+        return ""  # Skip elements without text
+
+    handler = _MARKDOWN_HANDLERS.get(element_type, _paragraph_to_markdown)
+    return handler(text, element, file_path)
+
+
+def _paragraph_to_markdown(text, element, file_path):
+    return f"{text}\n\n"
+
+
+def _unordered_list_to_markdown(text, element, file_path):
+    return "\n".join([f"- {item.strip()}" for item in text.split('\n')]) + "\n\n"
+
+
+def _ordered_list_to_markdown(text, element, file_path):
+    return "\n".join([f"{idx}. {item.strip()}" for idx, item in enumerate(text.split('\n'), 1)]) + "\n\n"
+
+
+def _figure_to_markdown(text, element, file_path):
+    caption = element.metadata.get('caption', 'Figure')
+    return f"![{caption}]({file_path})\n\n"
+
+
+def _table_to_markdown(element):
+    """
+    Converts a table element into Markdown table format.
+
+    Args:
+        element: The table element containing data.
+
+    Returns:
+        str: The table in Markdown format.
+    """
+    # Placeholder implementation for table conversion
+    markdown_table = "[Table content not available]\n\n"
+    return markdown_table
+
+
+def _get_unstructured_client(api_key):
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            client = UnstructuredClient(api_key_auth=api_key, server_url=UNSTRUCTURED_SERVER_URL)
+            _CLIENTS[api_key] = client
+        return client
+
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    # Loaded on first use rather than at import, since tiktoken may need to fetch the BPE file
+    return tiktoken.get_encoding(_TOKEN_ENCODING_NAME)
+
+
+def _token_len(text):
+    return len(_get_encoding().encode_ordinary(text))
+
+
+def _split_to_token_limit(text, max_tokens):
+    """
+    Splits text at spaces into pieces of at most max_tokens tokens each. A run without spaces that
+    is still too long is cut every max_tokens // 4 characters (a character is at most four UTF-8
+    bytes and every token covers at least one byte).
+
+    Args:
+        text (str): The text to split.
+        max_tokens (int): Maximum size of each piece, in tokens.
+
+    Returns:
+        list: The pieces, in order; joined they give back text.
+    """
+    pieces = []
+    buf = []
+    buf_len = 0
+    step = max(1, max_tokens // 4)
+    for word in _WORD_END_RE.split(text):
+        wlen = _token_len(word)
+        parts = [(word, wlen)]
+        if wlen > max_tokens:
+            parts = [(word[i:i + step], _token_len(word[i:i + step])) for i in range(0, len(word), step)]
+        for part, part_len in parts:
+            if buf and buf_len + part_len > max_tokens:
+                pieces.append("".join(buf))
+                buf = []
+                buf_len = 0
+            buf.append(part)
+            buf_len += part_len
+    if buf:
+        pieces.append("".join(buf))
+    return pieces
+
+
+def _iter_paragraphs(markdown_content):
+    """
+    Lazily yields the pieces of markdown_content between blank-line breaks,
+    matching markdown_content.split('\\n\\n') without building the whole list.
+    """
+    start = 0
+    for match in _PARAGRAPH_BREAK_RE.finditer(markdown_content):
+        yield markdown_content[start:match.start()]
+        start = match.end()
+    yield markdown_content[start:]
+
+
+# Maps element.category to a function (text, element, file_path) -> str.
+# Categories not listed here are emitted as plain paragraphs.
+_MARKDOWN_HANDLERS = {
+    'Title': lambda text, element, file_path: f"# {text}\n\n",
+    'Heading': lambda text, element, file_path: f"## {text}\n\n",
+    'Subheading': lambda text, element, file_path: f"### {text}\n\n",
+    'UnorderedList': _unordered_list_to_markdown,
+    'OrderedList': _ordered_list_to_markdown,
+    'Table': lambda text, element, file_path: _table_to_markdown(element),
+    'Figure': _figure_to_markdown,
+}
 
 
 class DocumentProcessor:
-    def __init__(self, file_path, unstructured_api_key=None, openai_api_key=None, chunking=True, exists_tables=False):
+    def __init__(self, file_path, unstructured_api_key=None, openai_api_key=None, chunking=True, exists_tables=False,
+                 max_concurrent_requests=8, max_retries=0, unstructured_client=None, openai_client=None,
+                 use_cache=True, cache_dir=DEFAULT_CACHE_DIR):
         """
         Initializes the DocumentProcessor class.
 
@@ -21,6 +227,14 @@ class DocumentProcessor:
             openai_api_key (str, optional): API key for the OpenAI GPT-4 API. Defaults to None.
             chunking (bool, optional): Whether to chunk the document. Defaults to True.
             exists_tables (bool, optional): Whether the document contains tables. Defaults to False.
+            max_concurrent_requests (int, optional): Maximum number of OpenAI requests in flight at once. Defaults to 8.
+            max_retries (int, optional): Times to retry the Unstructured API on rate-limit or server errors. Defaults to 0.
+            unstructured_client (UnstructuredClient, optional): Client to share with other processors. Defaults to None.
+            openai_client (AsyncOpenAI, optional): Client to share with other processors. It is bound to the event loop
+                it is first used on, so it is only used by apolish_markdown_with_gpt when called on that loop. When None,
+                each polishing run opens and closes its own client. Defaults to None.
+            use_cache (bool, optional): Whether to reuse cached Unstructured API results for identical PDFs. Defaults to True.
+            cache_dir (str, optional): Directory for cached API results. Defaults to ~/.cache/docproc.
         """
         print(f"Initializing DocumentProcessor for file: {file_path}")
         self.file_path = file_path
@@ -41,35 +255,37 @@ class DocumentProcessor:
         else:
             self.openai_api_key = openai_api_key
 
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_retries = max_retries
+        self.use_cache = use_cache
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.unstructured_client = unstructured_client or _get_unstructured_client(self.unstructured_api_key)
+        self.openai_client = openai_client
         self.elements = None
+        # Markdown produced from self.elements, and the element list it was produced from
+        self._markdown_cache = None
+        self._markdown_cache_source = None
 
     def get_file_type(self):
         """
-        Determines the file type based on MIME type.
+        Determines the file type based on the file extension.
 
         Returns:
             str: The file type (e.g., 'pdf', 'docx', 'txt').
         """
-        file_type, _ = mimetypes.guess_type(self.file_path)
-        print(f"Determined MIME type: {file_type}")
-        if file_type == 'application/pdf':
-            return 'pdf'
-        elif file_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-            return 'docx'
-        elif file_type == 'text/plain':
-            return 'txt'
-        elif file_type == 'text/markdown':
-            return 'md'
-        else:
-            return 'unknown'
+        return _EXT_MAP.get(os.path.splitext(self.file_path)[1].lower(), 'unknown')
 
     def preprocess(self):
         """
         Preprocesses the document using the appropriate method based on file type.
+        The result is kept on the instance, so repeated calls do not re-run partitioning.
 
         Returns:
             list: A list of unstructured elements extracted from the document.
         """
+        if self.elements is not None:
+            return self.elements
+
         file_type = self.get_file_type()
         print(f"File type identified as: {file_type}")
         if file_type == 'pdf':
@@ -86,26 +302,18 @@ class DocumentProcessor:
             list: A list of unstructured elements extracted from the PDF.
         """
         print("Starting PDF preprocessing...")
-        s = UnstructuredClient(
-            api_key_auth=self.unstructured_api_key,
-            server_url="https://api.unstructuredapp.io/general/v0/general",
-        )
-        with open(self.file_path, "rb") as f:
-            files = shared.Files(
-                content=f.read(),
-                file_name=os.path.basename(self.file_path),
-            )
-        req = shared.PartitionParameters(
-            files=files,
-            strategy="hi_res",
-            pdf_infer_table_structure=self.exists_tables,
-            languages=["eng"],
-            coordinates=True,
-        )
+        params = self._partition_params()
+        cache_path = elements_cache_path(self.cache_dir, self.file_path, params) if self.use_cache else None
+        element_dicts = load_cached_elements(cache_path) if cache_path else None
         try:
-            resp = s.general.partition(req)
-            elements = dict_to_elements(resp.elements)
-            print(f"Received {len(elements)} elements from the Unstructured API.")
+            if element_dicts is None:
+                element_dicts = self._partition_pdf(self.unstructured_client, params).elements
+                if cache_path:
+                    save_cached_elements(cache_path, element_dicts)
+                print(f"Received {len(element_dicts)} elements from the Unstructured API.")
+            else:
+                print(f"Loaded {len(element_dicts)} elements from cache.")
+            elements = dict_to_elements(element_dicts)
             if self.chunking:
                 print("Applying chunking to elements...")
                 elements = chunk_by_title(
@@ -121,6 +329,47 @@ class DocumentProcessor:
             print(f"Error processing PDF: {e}")
             return None
 
+    def _partition_params(self):
+        """
+        Returns the Unstructured API partition parameters used for PDFs (everything except the file).
+        """
+        return pdf_partition_params(self.exists_tables)
+
+    def _partition_pdf(self, client, params):
+        """
+        Sends the PDF to the Unstructured API, retrying rate-limit and server errors
+        with exponential backoff up to max_retries times.
+
+        Args:
+            client (UnstructuredClient): The client to send the request with.
+            params (dict): Partition parameters from _partition_params().
+
+        Returns:
+            The partition response from the Unstructured API.
+
+        Raises:
+            SDKError: If the request fails with a non-transient error or retries run out.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Hand the SDK the open file rather than its bytes so the upload is read
+                # from disk as it is sent instead of being buffered in memory first
+                with open(self.file_path, "rb") as f:
+                    files = shared.Files(
+                        content=f,
+                        file_name=os.path.basename(self.file_path),
+                    )
+                    req = shared.PartitionParameters(files=files, **params)
+                    return client.general.partition(req)
+            except SDKError as e:
+                status_code = getattr(e, 'status_code', None)
+                transient = status_code == 429 or (status_code is not None and status_code >= 500)
+                if not transient or attempt == self.max_retries:
+                    raise
+                delay = RETRY_BASE_DELAY * 2 ** attempt
+                print(f"Unstructured API returned {status_code}, retrying in {delay:.0f}s...")
+                time.sleep(delay)
+
     def rule_partition(self):
         """
         Preprocesses non-PDF documents using rule-based partitioning.
@@ -149,7 +398,8 @@ class DocumentProcessor:
 
     def convert_to_markdown(self):
         """
-        Converts the preprocessed elements into Markdown format.
+        Converts the preprocessed elements into Markdown format. The result is cached
+        until self.elements is replaced or invalidate_cache() is called.
 
         Returns:
             str: The document content in Markdown format.
@@ -157,13 +407,28 @@ class DocumentProcessor:
         if self.elements is None:
             print("No elements to convert. Please run preprocess() first.")
             return None
+        if self._markdown_cache is not None and self._markdown_cache_source is self.elements:
+            return self._markdown_cache
 
-        markdown_text = ""
         print("Converting elements to Markdown...")
-        for idx, element in enumerate(self.elements):
-            print(f"Processing element {idx + 1}/{len(self.elements)}: {type(element)}")
-            markdown_text += self.element_to_markdown(element)
-        return markdown_text
+        elements = _flatten_elements(self.elements)
+        parts = []
+        n = len(elements)
+        debug = log.isEnabledFor(logging.DEBUG)
+        for idx, element in enumerate(elements):
+            if debug:
+                log.debug("Processing element %d/%d: %s", idx + 1, n, type(element))
+            parts.append(_element_to_markdown(element, self.file_path))
+        self._markdown_cache = "".join(parts)
+        self._markdown_cache_source = self.elements
+        return self._markdown_cache
+
+    def invalidate_cache(self):
+        """
+        Discards the cached Markdown. Call this after mutating self.elements in place.
+        """
+        self._markdown_cache = None
+        self._markdown_cache_source = None
 
     def element_to_markdown(self, element):
         """
@@ -175,46 +440,7 @@ class DocumentProcessor:
         Returns:
             str: The Markdown representation of the element.
         """
-        if hasattr(element, 'category'):
-            # Handle single elements
-            element_type = element.category
-            text = element.text.strip() if element.text else ""
-
-            if not text:
-                return ""  # Skip elements without text
-
-            if element_type == 'Title':
-                return f"# {text}\n\n"
-            elif element_type == 'Heading':
-                return f"## {text}\n\n"
-            elif element_type == 'Subheading':
-                return f"### {text}\n\n"
-            elif element_type == 'UnorderedList':
-                markdown = ""
-                for item in text.split('\n'):
-                    markdown += f"- {item.strip()}\n"
-                return markdown + "\n"
-            elif element_type == 'OrderedList':
-                markdown = ""
-                for idx, item in enumerate(text.split('\n'), 1):
-                    markdown += f"{idx}. {item.strip()}\n"
-                return markdown + "\n"
-            elif element_type == 'Table':
-                return self.table_to_markdown(element)
-            elif element_type == 'Figure':
-                caption = element.metadata.get('caption', 'Figure')
-                return f"![{caption}]({self.file_path})\n\n"
-            else:
-                return f"{text}\n\n"
-        elif hasattr(element, 'elements'):
-            # Handle CompositeElement
-            markdown = ""
-            for sub_element in element.elements:
-                markdown += self.element_to_markdown(sub_element)
-            return markdown
-        else:
-            print(f"Unknown element type: {element}")
-            return ""
+        return "".join([_element_to_markdown(e, self.file_path) for e in _flatten_elements([element])])
 
     def table_to_markdown(self, element):
         """
@@ -226,9 +452,7 @@ class DocumentProcessor:
         Returns:
             str: The table in Markdown format.
         """
-        # Placeholder implementation for table conversion
-        markdown_table = "[Table content not available]\n\n"
-        return markdown_table
+        return _table_to_markdown(element)
 
     def save_markdown(self, output_path, markdown_text=None):
         """
@@ -236,36 +460,63 @@ class DocumentProcessor:
 
         Args:
             output_path (str): The file path where the Markdown content will be saved.
-            markdown_text (str, optional): The markdown text to save. If None, it will use the result from convert_to_markdown().
+            markdown_text (str, optional): The markdown text to save. If None, it will use the result from convert_to_markdown(),
+                which is served from the cache when the elements have already been converted.
         """
         if markdown_text is None:
             markdown_text = self.convert_to_markdown()
         if markdown_text:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(markdown_text)
+            with open(output_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
+                for start in range(0, len(markdown_text), _WRITE_BUFFER_SIZE):
+                    f.write(markdown_text[start:start + _WRITE_BUFFER_SIZE].encode('utf-8'))
             print(f"Markdown content saved to {output_path}")
         else:
             print("No Markdown content to save.")
 
-    def polish_markdown_with_gpt(self, markdown_content):
+    def polish_markdown_with_gpt(self, markdown_content=None):
         """
         Uses the GPT-4 API to fix OCR errors in the markdown content.
 
         Args:
-            markdown_content (str): The markdown content to polish.
+            markdown_content (str, optional): The markdown content to polish. If None, it will use the
+                (cached) result from convert_to_markdown().
 
         Returns:
             str: The polished markdown content.
         """
+        return run_sync(lambda: self.apolish_markdown_with_gpt(markdown_content))
+
+    async def apolish_markdown_with_gpt(self, markdown_content=None):
+        """
+        Async version of polish_markdown_with_gpt, for callers that already run an event loop.
+
+        Args:
+            markdown_content (str, optional): The markdown content to polish. If None, it will use the
+                (cached) result from convert_to_markdown().
+
+        Returns:
+            str: The polished markdown content.
+        """
+        if markdown_content is None:
+            markdown_content = self.convert_to_markdown()
+            if not markdown_content:
+                return None
+
         # Split the markdown content into chunks
         chunks = self.split_markdown_into_chunks(markdown_content)
         print(f"Split markdown content into {len(chunks)} chunks.")
 
+        if self.openai_client is not None:
+            results = await self._polish_chunks(chunks, self.openai_client)
+        else:
+            # The client's connection pool belongs to the running loop, so it is opened and closed with this run.
+            # One client per run still reuses connections across all of its chunk requests.
+            async with AsyncOpenAI(api_key=self.openai_api_key) as client:
+                results = await self._polish_chunks(chunks, client)
+
         polished_chunks = []
-        for idx, chunk in enumerate(chunks):
-            print(f"Processing chunk {idx + 1}/{len(chunks)}")
-            polished_chunk = self.polish_chunk_with_gpt(chunk)
-            if polished_chunk:
+        for idx, (chunk, polished_chunk) in enumerate(zip(chunks, results)):
+            if polished_chunk and not isinstance(polished_chunk, Exception):
                 polished_chunks.append(polished_chunk)
             else:
                 print(f"Failed to polish chunk {idx + 1}")
@@ -274,83 +525,258 @@ class DocumentProcessor:
         polished_markdown = "\n".join(polished_chunks)
         return polished_markdown
 
-    def split_markdown_into_chunks(self, markdown_content, min_chunk_size=500, max_chunk_size=2000):
+    async def _polish_chunks(self, chunks, client):
+        """
+        Polishes all chunks concurrently, keeping at most max_concurrent_requests requests in flight.
+
+        Args:
+            chunks (list): The markdown chunks to polish.
+            client (AsyncOpenAI): Client to send the requests with.
+
+        Returns:
+            list: The polished chunks (or exceptions/None for failed chunks), in the original order.
+        """
+        sem = asyncio.Semaphore(self.max_concurrent_requests)
+        tasks = [self._polish_async(chunk, sem, client) for chunk in chunks]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _polish_async(self, chunk, sem, client):
+        async with sem:
+            log.debug("Polishing chunk of %d characters", len(chunk))
+            return await self.polish_chunk_with_gpt(chunk, client)
+
+    def split_markdown_into_chunks(self, markdown_content, min_chunk_size=450, max_chunk_size=1800):
         """
         Splits the markdown content into chunks based on paragraph and sentence breaks.
+        Sizes are measured in model tokens, so every chunk fits the polishing request's
+        output budget (POLISH_MAX_OUTPUT_TOKENS) with room to spare.
 
         Args:
             markdown_content (str): The markdown content to split.
-            min_chunk_size (int): Minimum size of each chunk.
-            max_chunk_size (int): Maximum size of each chunk.
+            min_chunk_size (int): Size a chunk should reach before it is closed at a paragraph break, in tokens.
+                Chunks may be smaller where that is needed to stay under max_chunk_size.
+            max_chunk_size (int): Maximum size of each chunk, in tokens. Sentences longer than this are split
+                at spaces.
 
         Returns:
             list: A list of markdown content chunks.
         """
-        paragraphs = markdown_content.split('\n\n')
         chunks = []
-        current_chunk = ""
+        buf = []
+        buf_len = 0
 
-        for paragraph in paragraphs:
-            if not paragraph.strip():
+        for paragraph in _iter_paragraphs(markdown_content):
+            if not paragraph or paragraph.isspace():
                 continue  # Skip empty paragraphs
-            paragraph += '\n\n'  # Add paragraph break back
-
-            if len(current_chunk) + len(paragraph) <= max_chunk_size:
-                current_chunk += paragraph
+            # The paragraph break is kept as its own fragment ('\n\n' is a single token)
+            # instead of being concatenated onto the paragraph text
+            plen = _token_len(paragraph) + 1
+
+            if buf_len + plen <= max_chunk_size:
+                buf.append(paragraph)
+                buf.append('\n\n')
+                buf_len += plen
+            elif buf_len >= min_chunk_size and plen <= max_chunk_size:
+                chunks.append("".join(buf).strip())
+                buf = [paragraph, '\n\n']
+                buf_len = plen
             else:
-                if len(current_chunk) >= min_chunk_size:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = paragraph
-                else:
-                    # Try to split at sentence boundaries
-                    sentences = re.split(r'(?<=[.!?]) +', paragraph)
-                    for sentence in sentences:
-                        if len(current_chunk) + len(sentence) <= max_chunk_size:
-                            current_chunk += sentence + ' '
-                        else:
-                            if len(current_chunk) >= min_chunk_size:
-                                chunks.append(current_chunk.strip())
-                                current_chunk = sentence + ' '
-                            else:
-                                current_chunk += sentence + ' '
-                    current_chunk += '\n\n'
-
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+                # A paragraph that overflows a still-undersized chunk, or is too long for any chunk, is split at
+                # sentence boundaries, and sentences that are themselves too long at spaces
+                for sentence in _SENTENCE_END_RE.split(paragraph):
+                    sentence += ' '
+                    slen = _token_len(sentence)
+                    pieces = [(sentence, slen)]
+                    if slen > max_chunk_size:
+                        pieces = [(piece, _token_len(piece)) for piece in _split_to_token_limit(sentence, max_chunk_size)]
+                    for piece, piece_len in pieces:
+                        if buf and buf_len + piece_len > max_chunk_size:
+                            chunks.append("".join(buf).strip())
+                            buf = []
+                            buf_len = 0
+                        buf.append(piece)
+                        buf_len += piece_len
+                buf.append('\n\n')
+                buf_len += 1
+
+        last_chunk = "".join(buf).strip()
+        if last_chunk:
+            chunks.append(last_chunk)
 
         return chunks
 
-    def polish_chunk_with_gpt(self, chunk):
+    async def polish_chunk_with_gpt(self, chunk, client=None):
         """
         Polishes a single chunk of markdown content using GPT-4 API.
 
         Args:
             chunk (str): The markdown chunk to polish.
+            client (AsyncOpenAI, optional): Client to send the request with. Defaults to self.openai_client,
+                or a client opened just for this request if there is none.
 
         Returns:
-            str: The polished markdown chunk.
+            str: The polished markdown chunk, or None if the request failed or the output was cut off.
         """
+        client = client or self.openai_client
+        if client is None:
+            async with AsyncOpenAI(api_key=self.openai_api_key) as client:
+                return await self.polish_chunk_with_gpt(chunk, client)
+
         prompt = f"""Fix the errors in OCR in the following text. Do not change the meaning of the content. Only fix the formatting of the content and typos within the text. Your output should only consist of the polished markdown text.
 
 {chunk}
 """
-        openai.api_key = self.openai_api_key
         try:
-            response = openai.ChatCompletion.create(
+            # Stream the completion so tokens are consumed as they are generated
+            # and the connection is released as soon as the model finishes
+            stream = await client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0,
-                max_tokens=2048,
+                max_tokens=POLISH_MAX_OUTPUT_TOKENS,
+                stream=True,
             )
-            polished_chunk = response['choices'][0]['message']['content']
+            parts = []
+            finish_reason = None
+            async for event in stream:
+                if event.choices:
+                    parts.append(event.choices[0].delta.content or "")
+                    finish_reason = event.choices[0].finish_reason or finish_reason
+            if finish_reason == "length":
+                # A truncated rewrite would silently drop the end of the chunk, so the original is kept instead
+                print("Polished output hit the token limit; keeping the original chunk.")
+                return None
+            polished_chunk = "".join(parts)
             return polished_chunk.strip()
         except Exception as e:
             print(f"Error during OpenAI API call: {e}")
             return None
 
 
+@dataclass
+class BatchResult:
+    """
+    Outcome of a DocumentBatchProcessor run.
+
+    Attributes:
+        successful (list): (file_path, markdown) pairs for documents that were processed.
+        failed (list): (file_path, error message) pairs for documents that could not be processed.
+    """
+    successful: list = field(default_factory=list)
+    failed: list = field(default_factory=list)
+
+
+class DocumentBatchProcessor:
+    """
+    Runs the preprocess -> convert -> polish pipeline over many documents at once.
+
+    Documents are processed on a thread pool since the work is dominated by waiting
+    on the Unstructured and OpenAI APIs. All workers share one UnstructuredClient and
+    one AsyncOpenAI client so their HTTP connection pools are reused.
+    """
+
+    def __init__(self, unstructured_api_key=None, openai_api_key=None, chunking=True, exists_tables=False,
+                 polish=True, max_retries=3, max_concurrent_requests=8):
+        """
+        Initializes the DocumentBatchProcessor class.
+
+        Args:
+            unstructured_api_key (str, optional): API key for the Unstructured API. Defaults to None.
+            openai_api_key (str, optional): API key for the OpenAI GPT-4 API. Defaults to None.
+            chunking (bool, optional): Whether to chunk the documents. Defaults to True.
+            exists_tables (bool, optional): Whether the documents contain tables. Defaults to False.
+            polish (bool, optional): Whether to polish the markdown with GPT. Defaults to True.
+            max_retries (int, optional): Times to retry the Unstructured API on transient errors. Defaults to 3.
+            max_concurrent_requests (int, optional): Maximum OpenAI requests in flight per document. Defaults to 8.
+        """
+        self.unstructured_api_key = unstructured_api_key or os.getenv("SAMARTH_UNSTRUCTURED_API_KEY")
+        if not self.unstructured_api_key:
+            raise ValueError("Unstructured API key must be provided or set in environment variables.")
+        self.openai_api_key = openai_api_key or os.getenv("MOSAICAI_OPENAI_API_KEY")
+        if not self.openai_api_key:
+            raise ValueError("OpenAI API key must be provided or set in environment variables.")
+
+        self.chunking = chunking
+        self.exists_tables = exists_tables
+        self.polish = polish
+        self.max_retries = max_retries
+        self.max_concurrent_requests = max_concurrent_requests
+        self.unstructured_client = _get_unstructured_client(self.unstructured_api_key)
+
+    def run(self, file_paths, max_workers=8, progress_callback=None):
+        """
+        Processes all documents concurrently.
+
+        Args:
+            file_paths (list[str]): Paths of the documents to process.
+            max_workers (int, optional): Number of documents processed at once. Defaults to 8.
+            progress_callback (callable, optional): Called as progress_callback(done, total) after each document.
+
+        Returns:
+            BatchResult: The markdown for each successful document and the error for each failed one.
+        """
+        result = BatchResult()
+        total = len(file_paths)
+
+        # The async OpenAI client is bound to the event loop it is first used on, so all
+        # workers submit their polishing to one loop running on a background thread.
+        loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+        loop_thread.start()
+        openai_client = AsyncOpenAI(api_key=self.openai_api_key)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as ex:
+                futures = {ex.submit(self._process_one, file_path, openai_client, loop): file_path
+                           for file_path in file_paths}
+                for done, future in enumerate(as_completed(futures), 1):
+                    file_path = futures[future]
+                    try:
+                        markdown = future.result()
+                    except Exception as e:
+                        print(f"Failed to process {file_path}: {e}")
+                        result.failed.append((file_path, str(e)))
+                    else:
+                        result.successful.append((file_path, markdown))
+                    if progress_callback is not None:
+                        progress_callback(done, total)
+        finally:
+            asyncio.run_coroutine_threadsafe(openai_client.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            loop_thread.join()
+            loop.close()
+        return result
+
+    def _process_one(self, file_path, openai_client, loop):
+        """
+        Runs the full pipeline for a single document on a worker thread.
+
+        Returns:
+            str: The (optionally polished) markdown for the document.
+        """
+        processor = DocumentProcessor(
+            file_path,
+            unstructured_api_key=self.unstructured_api_key,
+            openai_api_key=self.openai_api_key,
+            chunking=self.chunking,
+            exists_tables=self.exists_tables,
+            max_concurrent_requests=self.max_concurrent_requests,
+            max_retries=self.max_retries,
+            unstructured_client=self.unstructured_client,
+            openai_client=openai_client,
+        )
+        if processor.preprocess() is None:
+            raise RuntimeError("Preprocessing returned no elements.")
+        markdown = processor.convert_to_markdown()
+        if not markdown:
+            raise RuntimeError("No markdown content generated.")
+        if self.polish:
+            future = asyncio.run_coroutine_threadsafe(processor.apolish_markdown_with_gpt(markdown), loop)
+            markdown = future.result()
+        return markdown
+
+
 # Example usage:
 if __name__ == "__main__":
     # Replace with the path to your document
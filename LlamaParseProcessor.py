@@ -1,5 +1,16 @@
 import os
-from typing import List, Optional
+import argparse
+import dbm
+import hashlib
+import pickle
+import re
+import shelve
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 import openai
 from openai import OpenAI
@@ -8,12 +19,113 @@ import dotenv
 
 dotenv.load_dotenv()
 
+@dataclass
+class StatusTracker:
+    """
+    Running counts for requests paced by a RateLimiter (after the OpenAI cookbook's parallel request processor).
+    """
+    num_requests: int = 0
+    num_rate_limit_errors: int = 0
+    time_of_last_rate_limit_error: float = 0.0
+
+class RateLimiter:
+    """
+    Token-bucket throttle that paces OpenAI requests under per-minute request and token limits,
+    so callers wait briefly before sending instead of being rejected with 429s. Thread-safe.
+
+    Attributes:
+        requests_per_minute (float): Maximum requests per minute.
+        tokens_per_minute (float): Maximum tokens per minute.
+        available_request_capacity (float): Requests that can be sent right now.
+        available_token_capacity (float): Tokens that can be sent right now.
+        status_tracker (StatusTracker): Counts of requests and rate limit errors.
+    """
+
+    # After a 429 slips through anyway, hold all requests back for this long so the limit can recover
+    seconds_to_pause_after_rate_limit_error = 15
+    seconds_to_sleep_each_loop = 0.05
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        """
+        Initializes the RateLimiter with full capacity.
+
+        Args:
+            requests_per_minute (float): Maximum requests per minute.
+            tokens_per_minute (float): Maximum tokens per minute.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.available_request_capacity = requests_per_minute
+        self.available_token_capacity = tokens_per_minute
+        self.last_update_time = time.monotonic()
+        self.status_tracker = StatusTracker()
+        self._lock = threading.Lock()
+
+    def acquire(self, est_tokens: int) -> None:
+        """
+        Blocks until there is capacity for one request of about est_tokens tokens, then reserves it.
+
+        Args:
+            est_tokens (int): Estimated prompt plus completion tokens for the request.
+        """
+        est_tokens = min(est_tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self.last_update_time
+                self.available_request_capacity = min(
+                    self.available_request_capacity + elapsed * self.requests_per_minute / 60.0,
+                    self.requests_per_minute,
+                )
+                self.available_token_capacity = min(
+                    self.available_token_capacity + elapsed * self.tokens_per_minute / 60.0,
+                    self.tokens_per_minute,
+                )
+                self.last_update_time = now
+
+                pause = (self.status_tracker.time_of_last_rate_limit_error
+                         + self.seconds_to_pause_after_rate_limit_error - now)
+                if pause <= 0 and self.available_request_capacity >= 1 and self.available_token_capacity >= est_tokens:
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= est_tokens
+                    self.status_tracker.num_requests += 1
+                    return
+            time.sleep(max(pause, self.seconds_to_sleep_each_loop))
+
+    def record_rate_limit_error(self) -> None:
+        """
+        Records a 429 from the API so that subsequent requests back off.
+        """
+        with self._lock:
+            self.status_tracker.num_rate_limit_errors += 1
+            self.status_tracker.time_of_last_rate_limit_error = time.monotonic()
+
+# Shared by all PDFParser instances so concurrent parsers draw from the same budget (gpt-4o-mini tier 1 limits)
+DEFAULT_RATE_LIMITER = RateLimiter(requests_per_minute=500, tokens_per_minute=200_000)
+
+PAGE_PARSER_MODEL = "gpt-4o-mini-2024-07-18"
+# Parsed page numbers are reused for this long before the input is sent to GPT again
+PAGE_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+# Failures of the on-disk page cache (unwritable directory, corrupt, locked or incompatible database), which
+# are treated as cache misses since the cache is only an optimization
+_PAGE_CACHE_ERRORS = (OSError, pickle.UnpicklingError) + dbm.error
+# Largest range _parse_locally expands; longer spans are almost certainly typos and are not materialized
+MAX_LOCAL_PAGE_RANGE = 10_000
+# One comma-separated item of a purely numeric page list: "7", "24-53", "10 to 17", "3 through 9"
+_LOCAL_PAGE_ITEM_RE = re.compile(r"^\s*(\d+)\s*(?:(?:-|–|to|through)\s*(\d+))?\s*$", re.IGNORECASE)
+
 class PageNumbers(BaseModel):
     """
     Pydantic model to define the structure of the page numbers.
     """
     pages: List[int]
 
+class BatchPageNumbers(BaseModel):
+    """
+    Pydantic model for page numbers parsed from several user inputs in one request, in input order.
+    """
+    results: List[PageNumbers]
+
 class PDFParser:
     """
     A class to parse PDF documents using LlamaParse and save the output as markdown.
@@ -25,7 +137,12 @@ class PDFParser:
         output_dir (Optional[str]): Directory to save the markdown file. Defaults to the PDF's directory.
     """
 
-    def __init__(self, pdf_path: str, openai_api_key: str, output_dir: Optional[str] = None):
+    # In-memory layer over the on-disk page cache, shared by all parsers
+    _page_memory_cache: Dict[str, List[int]] = {}
+    _page_cache_lock = threading.Lock()
+
+    def __init__(self, pdf_path: str, openai_api_key: str, output_dir: Optional[str] = None,
+                 rate_limiter: Optional[RateLimiter] = None, page_cache_path: str = ".page_cache"):
         """
         Initializes the PDFParser with the provided arguments.
 
@@ -33,11 +150,15 @@ class PDFParser:
             pdf_path (str): The path to the PDF file.
             openai_api_key (str): The OpenAI API key.
             output_dir (Optional[str]): Directory to save the markdown file. Defaults to the PDF's directory.
+            rate_limiter (Optional[RateLimiter]): Throttle for OpenAI requests. Defaults to DEFAULT_RATE_LIMITER.
+            page_cache_path (str): Path of the on-disk cache of parsed page numbers. Defaults to '.page_cache'.
         """
         self.pdf_path = pdf_path
         self.client = OpenAI(api_key=openai_api_key)
         self.openai_api_key = openai_api_key
         self.output_dir = output_dir if output_dir else os.path.dirname(pdf_path)
+        self.rate_limiter = rate_limiter if rate_limiter else DEFAULT_RATE_LIMITER
+        self.page_cache_path = page_cache_path
         openai.api_key = self.openai_api_key
 
     def get_user_page_input(self) -> Optional[str]:
@@ -62,28 +183,150 @@ class PDFParser:
         Raises: 
             ValueError: If the AI model fails to return a valid list of integers.
         """
-        
-        prompt = "Extract all mentioned page numbers from the user's input and return them as a JSON object following the schema {'pages': [list of integers]}."
+        return self.parse_many_page_numbers_with_gpt([user_input])[0]
+
+    def parse_many_page_numbers_with_gpt(self, user_inputs: List[str]) -> List[List[int]]:
+        """
+        Parses several page-number inputs with a single gpt-4o-mini request, so a batch
+        costs one request (and one round trip) instead of one per input. Purely numeric
+        inputs and inputs seen before are answered locally and are not sent.
+
+        Args: 
+            user_inputs (List[str]): The user inputs for page numbers.
+        Returns: 
+            List[List[int]]: A sorted list of unique page numbers for each input, in input order.
+        Raises: 
+            ValueError: If the AI model fails to return a valid list of integers for every input.
+        """
+        results: List[Optional[List[int]]] = [None] * len(user_inputs)
+        misses = []
+        for i, user_input in enumerate(user_inputs):
+            try:
+                results[i] = self._parse_locally(user_input)
+                continue
+            except ValueError:
+                pass
+            cached_pages = self._get_cached_pages(self._page_cache_key(user_input))
+            if cached_pages is not None:
+                results[i] = cached_pages
+            else:
+                misses.append(i)
+
+        if misses:
+            parsed = self._request_page_numbers([user_inputs[i] for i in misses])
+            for i, pages in zip(misses, parsed):
+                self._set_cached_pages(self._page_cache_key(user_inputs[i]), pages)
+                results[i] = pages
+        return results
+
+    def _parse_locally(self, user_input: str) -> List[int]:
+        """
+        Parses purely numeric page lists such as '1,3,5' or '24-53, 60 to 62' without calling GPT.
+
+        Args: 
+            user_input (str): The user's input for page numbers.
+        Returns: 
+            List[int]: A sorted list of unique page numbers.
+        Raises: 
+            ValueError: If the input is not a plain list of page numbers (starting from 1) and ascending ranges
+                of at most MAX_LOCAL_PAGE_RANGE pages.
+        """
+        pages = set()
+        for item in user_input.split(","):
+            match = _LOCAL_PAGE_ITEM_RE.match(item)
+            if not match:
+                raise ValueError(f"Cannot parse {item!r} locally.")
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else start
+            if start < 1:
+                raise ValueError(f"Page numbers start at 1, got {item!r}.")
+            if start > end:
+                raise ValueError(f"Descending range {item!r}.")
+            if end - start + 1 > MAX_LOCAL_PAGE_RANGE:
+                raise ValueError(f"Range {item!r} spans more than {MAX_LOCAL_PAGE_RANGE} pages.")
+            pages.update(range(start, end + 1))
+        return sorted(pages)
+
+    def _page_cache_key(self, user_input: str) -> str:
+        """
+        Returns the cache key for an input: a hash of the model and the input with case and whitespace normalized.
+        """
+        normalized = " ".join(user_input.lower().split())
+        return hashlib.sha256(f"{PAGE_PARSER_MODEL}:{normalized}".encode("utf-8")).hexdigest()
+
+    def _get_cached_pages(self, key: str) -> Optional[List[int]]:
+        """
+        Returns the cached page numbers for key, or None if they are missing or older than PAGE_CACHE_TTL_SECONDS.
+        """
+        with self._page_cache_lock:
+            pages = self._page_memory_cache.get(key)
+            if pages is None:
+                try:
+                    with shelve.open(self.page_cache_path) as db:
+                        entry = db.get(key)
+                except _PAGE_CACHE_ERRORS as e:
+                    print(f"Ignoring unreadable page cache {self.page_cache_path}: {e}")
+                    return None
+                if entry is None:
+                    return None
+                stored_at, pages = entry
+                if time.time() - stored_at > PAGE_CACHE_TTL_SECONDS:
+                    return None
+                self._page_memory_cache[key] = pages
+            return list(pages)
+
+    def _set_cached_pages(self, key: str, pages: List[int]) -> None:
+        """
+        Stores parsed page numbers in the in-memory and on-disk caches.
+        """
+        with self._page_cache_lock:
+            self._page_memory_cache[key] = list(pages)
+            try:
+                with shelve.open(self.page_cache_path) as db:
+                    db[key] = (time.time(), list(pages))
+            except _PAGE_CACHE_ERRORS as e:
+                print(f"Could not write page cache {self.page_cache_path}: {e}")
+
+    def _request_page_numbers(self, user_inputs: List[str]) -> List[List[int]]:
+        """
+        Sends the inputs to gpt-4o-mini in one structured-output request.
+
+        Args: 
+            user_inputs (List[str]): The user inputs for page numbers.
+        Returns: 
+            List[List[int]]: A sorted list of unique page numbers for each input, in input order.
+        Raises: 
+            ValueError: If the AI model fails to return a valid list of integers for every input.
+        """
+        prompt = ("Each numbered line of the user's message is a separate input. For each input, in order, extract all "
+                  "mentioned page numbers and return them as a JSON object following the schema "
+                  "{'results': [{'pages': [list of integers]}, ...]}, with exactly one entry per input.")
+        numbered_inputs = "\n".join(f"{i}: {user_input}" for i, user_input in enumerate(user_inputs))
 
         try:
+            # Roughly 4 characters per token for the input, plus headroom for the prompt and response
+            self.rate_limiter.acquire(est_tokens=len(numbered_inputs) // 4 + 256 * len(user_inputs))
             response = self.client.beta.chat.completions.parse(
-                model="gpt-4o-mini-2024-07-18",
+                model=PAGE_PARSER_MODEL,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": user_input},
+                    {"role": "user", "content": numbered_inputs},
                     {"role": "system", "content": prompt},
                 ],
-                response_format=PageNumbers
+                response_format=BatchPageNumbers
             )
 
             # Access the parsed response
-            parsed_response: PageNumbers = response.choices[0].message.parsed
+            parsed_response: BatchPageNumbers = response.choices[0].message.parsed
+            if len(parsed_response.results) != len(user_inputs):
+                raise ValueError(f"Expected {len(user_inputs)} results, got {len(parsed_response.results)}.")
 
             # Remove duplicates and sort
-            unique_pages = sorted(list(set(parsed_response.pages)))
-            return unique_pages
+            return [sorted(set(result.pages)) for result in parsed_response.results]
 
         except Exception as e:
+            if isinstance(e, openai.RateLimitError):
+                self.rate_limiter.record_rate_limit_error()
             print(f"Error parsing page numbers with AI: {e}")
             raise ValueError("Failed to parse page numbers.")
 
@@ -130,17 +373,18 @@ class PDFParser:
             print("Parsing the PDF document...")
             documents = parser.load_data(self.pdf_path)
 
-            # Combine the parsed text from all documents
-            markdown_content = '\n\n'.join([doc.text for doc in documents])
-
             # Determine the output file path
             pdf_filename = os.path.basename(self.pdf_path)
             markdown_filename = os.path.splitext(pdf_filename)[0] + '.md'
             output_file = os.path.join(self.output_dir, markdown_filename)
 
-            # Save the markdown content to a .md file
+            # Write each document's markdown straight to the .md file, separated by blank lines,
+            # instead of first joining them all into one string
             with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(markdown_content)
+                for i, doc in enumerate(documents):
+                    if i:
+                        f.write('\n\n')
+                    f.write(doc.text)
 
             print(f'Markdown file saved as {output_file}')
 
@@ -148,49 +392,137 @@ class PDFParser:
             print(f"Error during parsing: {e}")
             raise
 
-    def run(self):
+    def run(self, page_input: Optional[str] = None, parsing_instructions: Optional[str] = None,
+            interactive: bool = True, target_pages: Optional[List[int]] = None) -> bool:
         """
         Executes the full parsing workflow:
         1. Get user input for page numbers.
         2. If provided, parse the input into structured page numbers using GPT.
         3. Get user input for parsing instructions.
         4. Parse the PDF and save as markdown.
+
+        Args:
+            page_input (Optional[str]): Page numbers in any format, used instead of prompting when not interactive.
+            parsing_instructions (Optional[str]): Parsing instructions, used instead of prompting when not interactive.
+            interactive (bool): Whether to prompt the user for page numbers and parsing instructions. Defaults to True.
+            target_pages (Optional[List[int]]): Page numbers already parsed from page_input (e.g. once for a whole
+                batch), used instead of parsing page_input again.
+
+        Returns:
+            bool: True if the markdown was saved, False if parsing failed.
         """
         try:
-            user_input = self.get_user_page_input()
-            target_pages = None
+            user_input = self.get_user_page_input() if interactive else page_input
+            if interactive:
+                target_pages = None
 
-            if user_input:
+            if target_pages is None and user_input:
                 target_pages = self.parse_page_numbers_with_gpt(user_input)
+            if target_pages is not None:
                 print(f"Pages to parse: {target_pages}")
             else:
                 print("No specific pages provided. All pages will be parsed.")
 
-            parsing_instructions = self.get_parsing_instructions()
+            if interactive:
+                parsing_instructions = self.get_parsing_instructions()
             if parsing_instructions:
                 print(f"Parsing instructions: {parsing_instructions}")
             else:
                 print("No parsing instructions provided.")
 
             self.parse_pdf_to_markdown(target_pages, parsing_instructions)
+            return True
 
         except ValueError as ve:
             print(f"Parsing failed: {ve}")
         except Exception as ex:
             print(f"An unexpected error occurred: {ex}")
+        return False
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parses the command line options for running PDFParser without prompts.
+
+    Args:
+        argv (Optional[List[str]]): Arguments to parse. Defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    arg_parser = argparse.ArgumentParser(description="Parse PDF documents to markdown with LlamaParse.")
+    source = arg_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pdf", help="Path of the PDF file to parse.")
+    source.add_argument("--batch-file", help="Text file listing one PDF path per line, optionally followed by a tab and "
+                                             "the pages to parse for that PDF; the PDFs are parsed concurrently.")
+    arg_parser.add_argument("--pages", help="Pages to parse in any format, e.g. '10 through 17, 24-53'. Defaults to all pages.")
+    arg_parser.add_argument("--instructions", help="Parsing instructions passed to LlamaParse.")
+    arg_parser.add_argument("--output-dir", help="Directory to save the markdown files. Defaults to each PDF's directory.")
+    arg_parser.add_argument("--workers", type=int, default=4, help="Number of PDFs parsed concurrently in batch mode. Defaults to 4.")
+    return arg_parser.parse_args(argv)
 
 if __name__ == "__main__":
     """
     Example usage of the PDFParser class.
     Ensure that you have set your OpenAI API key as an environment variable or replace 'YOUR_OPENAI_API_KEY' with your key.
+    Run with --pdf or --batch-file to parse without prompts; with no arguments the example below runs interactively.
     """
 
+    # Options are parsed before anything else so --help and usage errors work without an API key
+    args = parse_args() if len(sys.argv) > 1 else None
+
     # Replace 'YOUR_OPENAI_API_KEY' with your actual OpenAI API key or set it as an environment variable.
     OPENAI_API_KEY = os.getenv('SAMARTH_OPENAI_API_KEY') or 'YOUR_OPENAI_API_KEY'
 
     if OPENAI_API_KEY == 'YOUR_OPENAI_API_KEY':
         print("Please set your OpenAI API key in the code or as an environment variable 'OPENAI_API_KEY'.")
         exit(1)
+
+    if args is not None:
+        # (pdf path, page input) for each PDF; a batch file line may override --pages after a tab
+        jobs = []
+        if args.batch_file:
+            with open(args.batch_file, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        path, _, pages = line.rstrip('\n').partition('\t')
+                        jobs.append((path.strip(), pages.strip() or args.pages))
+        else:
+            jobs.append((args.pdf, args.pages))
+        pdf_paths = [path for path, _ in jobs]
+
+        missing = [path for path in pdf_paths if not os.path.isfile(path)]
+        if missing:
+            print(f"The following files do not exist: {', '.join(missing)}")
+            exit(1)
+
+        parsers = [PDFParser(pdf_path=path, openai_api_key=OPENAI_API_KEY, output_dir=args.output_dir)
+                   for path in pdf_paths]
+
+        # Every distinct page input is parsed up front in a single request, rather than by each
+        # parser on its own thread where identical inputs would race past the cache
+        page_inputs = list(dict.fromkeys(pages for _, pages in jobs if pages))
+        resolved_pages = {}
+        if page_inputs:
+            try:
+                resolved_pages = dict(zip(page_inputs, parsers[0].parse_many_page_numbers_with_gpt(page_inputs)))
+            except ValueError as ve:
+                print(f"Parsing failed: {ve}")
+                exit(1)
+
+        def run_job(parser, pages):
+            return parser.run(pages, args.instructions, interactive=False,
+                              target_pages=resolved_pages.get(pages) if pages else None)
+
+        # Parsing mostly waits on LlamaParse, so several PDFs are parsed at once
+        with ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(parsers)))) as ex:
+            succeeded = list(ex.map(run_job, parsers, [pages for _, pages in jobs]))
+        failed = [path for path, ok in zip(pdf_paths, succeeded) if not ok]
+        if failed:
+            # A non-zero exit status lets scripted batches detect failed PDFs
+            print(f"Failed to parse {len(failed)} of {len(pdf_paths)} PDFs: {', '.join(failed)}")
+            exit(1)
+        exit(0)
+
     # Replace 'path/to/your/document.pdf' with the actual path to your PDF file.
     pdf_file_path = '/Users/samarthkumbla/Documents/Columbia/ContemporaryCivilizations/Sections - Politics/Book4 1-5.pdf'
 
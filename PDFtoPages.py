@@ -1,45 +1,153 @@
-from pdf2image import convert_from_path
+import argparse
+import io
 import os
+import pymupdf  # PyMuPDF
+import queue
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image
 from tqdm import tqdm
-from pdf2image.exceptions import PDFPageCountError, PDFSyntaxError
+
+
+def _render_page_range(pdf_path, start, stop, dpi, output_folder, base_filename, encoder_threads=2):
+    # Runs in a worker process: each worker opens its own copy of the document and renders pages [start, stop).
+    # Rendering and JPEG encoding overlap: one thread renders pages into a bounded queue while encoder
+    # threads drain it. PIL releases the GIL while encoding, so the two stages run in parallel.
+    # Every process has its own queue and a decoded 300 DPI page is ~25 MB, so the bound is kept to
+    # a couple of pages per encoder rather than a fixed depth that would multiply with the worker count
+    pages = queue.Queue(maxsize=2 * encoder_threads)
+    image_paths = []
+    errors = []
+
+    def render_producer():
+        try:
+            zoom = dpi / 72  # PDF user space is 72 points per inch
+            matrix = pymupdf.Matrix(zoom, zoom)
+            with pymupdf.open(pdf_path) as doc:
+                for i in range(start, stop):
+                    # Render the page straight to an RGB pixmap in-process
+                    pixmap = doc.load_page(i).get_pixmap(matrix=matrix, alpha=False)
+                    image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+                    pages.put((i, image))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # One sentinel per encoder so every encoder thread stops
+            for _ in range(encoder_threads):
+                pages.put(None)
+
+    def encode_consumer():
+        while True:
+            item = pages.get()
+            if item is None:
+                return
+            i, image = item
+            try:
+                # Create the file path for each image (naming them with original filename plus page number)
+                image_path = os.path.join(output_folder, f'{base_filename}_pg{i + 1}.jpg')
+                # Encode into memory first, then hand the finished JPEG to the kernel in a single write
+                # instead of the many small writes PIL makes when saving to a path
+                encoded = io.BytesIO()
+                image.save(encoded, 'JPEG', quality=85)
+                with open(image_path, 'wb') as f:
+                    f.write(encoded.getbuffer())
+                image_paths.append((i, image_path))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=render_producer)]
+    threads += [threading.Thread(target=encode_consumer) for _ in range(encoder_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return [image_path for _, image_path in sorted(image_paths)]
+
 
 class PDFToImagesConverter:
-    def __init__(self, pdf_path, output_folder=None, dpi=300):
+    def __init__(self, pdf_path, output_folder=None, dpi=300, max_workers=None):
         self.pdf_path = pdf_path
         # Set default output folder to be the file title + "_output_images"
         base_filename = os.path.splitext(os.path.basename(pdf_path))[0]
         self.output_folder = output_folder or f'{base_filename}_output_images'
         self.dpi = dpi  # DPI value to control the quality of the output images
+        self.max_workers = max_workers or os.cpu_count() or 1  # Number of processes rendering pages
 
     def convert(self):
+        # Returns True once every page has been saved, and False if the conversion failed
         # Create output folder if it doesn't exist
         os.makedirs(self.output_folder, exist_ok=True)  # Create the directory where images will be saved
 
         # Convert PDF to images
         try:
-            # Convert PDF pages to images using the specified DPI (dots per inch) for quality
-            pages = convert_from_path(self.pdf_path, self.dpi)
-            # Use tqdm to add progress tracking
-            for i, page in enumerate(tqdm(pages, desc="Converting pages", unit="page")):
-                # Extract the original filename without extension
-                base_filename = os.path.splitext(os.path.basename(self.pdf_path))[0]
-                # Create the file path for each image (naming them with original filename plus page number)
-                image_path = os.path.join(self.output_folder, f'{base_filename}_pg{i + 1}.jpg')
-                # Save the page as a JPEG image
-                page.save(image_path, 'JPEG')
-                # Print a message indicating the image has been saved successfully
-                print(f'Saved: {image_path}')
+            if not os.path.isfile(self.pdf_path):
+                raise FileNotFoundError(self.pdf_path)
+            with pymupdf.open(self.pdf_path) as doc:
+                page_count = doc.page_count
+            if page_count == 0:
+                print("Error: The PDF has no pages.")
+                return False
+
+            # Extract the original filename without extension
+            base_filename = os.path.splitext(os.path.basename(self.pdf_path))[0]
+            # Split the pages into a few ranges per worker so progress updates as ranges finish
+            workers = min(self.max_workers, page_count)
+            range_size = max(1, -(-page_count // (workers * 4)))
+            page_ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+            # Use tqdm to add progress tracking (on stderr, refreshed at most twice a second)
+            with tqdm(total=page_count, desc="Converting pages", unit="page", file=sys.stderr, mininterval=0.5) as progress, \
+                    ProcessPoolExecutor(max_workers=workers) as ex:
+                futures = [
+                    ex.submit(_render_page_range, self.pdf_path, start, stop, self.dpi, self.output_folder, base_filename)
+                    for start, stop in page_ranges
+                ]
+                for future in as_completed(futures):
+                    progress.update(len(future.result()))
+            # Print a single message once all images have been saved
+            print(f"Saved {page_count} images to {self.output_folder}")
+            return True
         except FileNotFoundError:
             print("Error: The specified PDF file was not found.")
-        except PDFPageCountError:
-            print("Error: Unable to count the pages in the PDF. The file may be corrupted or not a valid PDF.")
-        except PDFSyntaxError:
-            print("Error: The PDF syntax is invalid. The file may be corrupted.")
+        except pymupdf.FileDataError:
+            print("Error: Unable to open the PDF. The file may be corrupted or not a valid PDF.")
         except Exception as e:
             # Print an error message if something goes wrong during the conversion process
             print(f"Unexpected error: {e}")
+        return False
+
+def parse_args(argv=None):
+    # Command line options for converting without prompts
+    parser = argparse.ArgumentParser(description="Convert the pages of PDF files to JPEG images.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pdf", help="Path of the PDF file to convert.")
+    source.add_argument("--batch-file", help="Text file listing one PDF path per line to convert.")
+    parser.add_argument("--output-dir", help="Folder to save the images in (default: <filename>_output_images).")
+    parser.add_argument("--dpi", type=int, default=300, help="DPI value for image quality (default: 300).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes rendering pages (default: CPU count).")
+    return parser.parse_args(argv)
 
 def main():
+    # With any command line options, convert without prompting (one PDF or every PDF in a batch file)
+    if len(sys.argv) > 1:
+        args = parse_args()
+        if args.batch_file:
+            with open(args.batch_file, encoding='utf-8') as f:
+                pdf_paths = [line.strip() for line in f if line.strip()]
+        else:
+            pdf_paths = [args.pdf]
+        # PDFs are converted one after another; each conversion already renders its pages across all workers
+        failed = [pdf_path for pdf_path in pdf_paths
+                  if not PDFToImagesConverter(pdf_path, args.output_dir, args.dpi, args.workers).convert()]
+        if failed:
+            # A non-zero exit status lets scripted batches detect failed PDFs
+            print(f"Failed to convert {len(failed)} of {len(pdf_paths)} PDFs: {', '.join(failed)}")
+            sys.exit(1)
+        return
+
     # Get the path to the PDF file from the user
     pdf_path = input("Enter the path to the PDF file: ")
     # Get the output folder name from the user, or use the default based on the file name
@@ -1,6 +1,13 @@
 import os
+import asyncio
+import csv
+import functools
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import gradio as gr
+import httpx
+import orjson
+import zstandard as zstd
 
 from unstructured.partition.auto import partition
 from unstructured.chunking.title import chunk_by_title
@@ -12,17 +19,60 @@ from unstructured_client.models import shared
 from unstructured_client.models.errors import SDKError
 from unstructured.staging.base import dict_to_elements # Converting API response to Unstructred Elements
 
-import pandas as pd
+from utils import DEFAULT_CACHE_DIR, elements_cache_path, load_cached_elements, pdf_partition_params, save_cached_elements
 
 
+UNSTRUCTURED_API_URL = "https://api.unstructuredapp.io/general/v0/general"
+# hi_res partitioning of a large PDF can take minutes, so the read timeout is generous
+UNSTRUCTURED_API_TIMEOUT = httpx.Timeout(10.0, read=600.0)
+# PDFs at or below this size are uploaded uncompressed when compress_uploads is on
+COMPRESS_UPLOADS_MIN_BYTES = 2_000_000
+COMPRESS_UPLOADS_LEVEL = 3
+
+
+def _elements_from_response(element_dicts, chunking):
+    """
+    Converts Unstructured API element dicts to Unstructured Elements, chunking them by title if requested.
+
+    Parameters:
+    element_dicts (list): Elements as returned by the Unstructured API
+    chunking (bool): Whether to chunk the elements by title
+
+    Returns:
+    list: Unstructured elements of document
+    """
+    elements = dict_to_elements(element_dicts)
+    if chunking:
+        elements = chunk_by_title(elements,
+                                  max_characters=1024,
+                                  new_after_n_chars=512,
+                                  include_orig_elements=True,
+                                  multipage_sections=True,
+                                  )
+    return elements
+
 
 class Preprocessing:
-    def __init__(self, doc_folder = None, docs = None, path = None, chunking = True, exists_tables=False):
+    # File types resolved from the extension alone, without consulting mimetypes
+    _EXT_MAP = {".pdf": "pdf", ".xlsx": "xlsx", ".xls": "xlsx", ".csv": "csv", ".zip": "zip"}
+
+    def __init__(self, doc_folder = None, docs = None, path = None, chunking = True, exists_tables=False,
+                 max_workers = 8, compress_uploads = False,
+                 use_cache = True, cache_dir = DEFAULT_CACHE_DIR, server_url = UNSTRUCTURED_API_URL):
         """
         Args:
             doc_folder (str, optional): Folder with set of documents to preprocess. Defaults to None.
             docs (list[str], optional): List of document basenames. Defaults to None.
             path (str, optional): Path to load documents from. Defaults to None.
+            max_workers (int, optional): Number of documents preprocessed concurrently. Defaults to 8.
+            compress_uploads (bool, optional): zstd-compress uploads of PDFs larger than COMPRESS_UPLOADS_MIN_BYTES
+                                               and send them with Content-Encoding: zstd. Only enable this with a
+                                               server_url whose server (or proxy in front of it) decodes zstd request
+                                               bodies. Defaults to False.
+            use_cache (bool, optional): Whether to reuse cached Unstructured API results for identical PDFs. Defaults to True.
+            cache_dir (str, optional): Directory for cached API results. Defaults to ~/.cache/docproc.
+            server_url (str, optional): Unstructured API endpoint PDFs are partitioned with, e.g. a self-hosted
+                                        deployment. Defaults to the hosted Unstructured API.
         """
         self.unstructured_api_key = os.getenv("SAMARTH_UNSTRUCTURED_API_KEY") # TODO - Add API Key to env
 
@@ -43,6 +93,11 @@ class Preprocessing:
         
         self.exists_tables = exists_tables
         self.chunking = chunking
+        self.max_workers = max_workers
+        self.compress_uploads = compress_uploads
+        self.server_url = server_url
+        self.use_cache = use_cache
+        self.cache_dir = os.path.expanduser(cache_dir)
 
         
         self.preprocessed_outputs = {}
@@ -52,7 +107,9 @@ class Preprocessing:
             self.preprocess_files()
         return self.preprocessed_outputs
     
-    def get_file_type(self, file_path):
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def get_file_type(file_path):
         """
         Determine the type of a file.
         
@@ -62,7 +119,12 @@ class Preprocessing:
         Returns:
         str: The type of the file (e.g., 'pdf', 'xlsx', 'csv', etc.).
         """
-        # Get the MIME type of the file
+        # Known extensions are resolved directly; results are cached per path
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext in Preprocessing._EXT_MAP:
+            return Preprocessing._EXT_MAP[ext]
+
+        # Otherwise fall back to the MIME type of the file
         file_type, _ = mimetypes.guess_type(file_path)
         
         # Map specific MIME types to desired file type strings
@@ -99,19 +161,135 @@ class Preprocessing:
         
         print("Preprocessing Files...")
         # self.preprocessed_outputs  --  Structure is -> {file_name: documentElements}
-        for file_path in file_names:
-            file_name = os.path.basename(file_path)
-            print(f"Preprocessing {file_name}...")
+        # Documents are independent and mostly wait on the Unstructured API, so several are processed at once.
+        # PDFs are sent from one event loop over a shared HTTP client; that loop runs in a pool thread, so it is
+        # started before anything else and never collides with an event loop already running in the caller
+        # (e.g. Jupyter). Other files are partitioned locally on the remaining threads in the meantime.
+        pdf_paths = [fp for fp in file_names if self.get_file_type(os.path.basename(fp)) == "pdf"]
+        other_paths = [fp for fp in file_names if self.get_file_type(os.path.basename(fp)) != "pdf"]
 
-            # If file is a pdf file
-            if self.get_file_type(file_name) == "pdf":
-                self.preprocessed_outputs[file_name] = self.preprocess_pdf(file_path)
+        # Results are collected by path and stored in input order at the end, so the outputs
+        # do not depend on which document happens to finish first
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            pdf_future = ex.submit(lambda: asyncio.run(self._preprocess_pdfs_async(pdf_paths))) if pdf_paths else None
+            futures = {ex.submit(self._process_one, file_path): file_path for file_path in other_paths}
 
-            else:
-                self.preprocessed_outputs[file_name] = self.rule_partition(file_path)
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+            if pdf_future is not None:
+                results.update(zip(pdf_paths, pdf_future.result()))
+
+        for file_path in file_names:
+            self.preprocessed_outputs[os.path.basename(file_path)] = results[file_path]
         return self.preprocessed_outputs
+
+    def _process_one(self, file_path):
+        """
+        Preprocesses a single non-pdf file locally
+
+        Parameters:
+        file_path (str): Path of the file to preprocess
+
+        Returns:
+        list: Unstructured elements of document, or None if partitioning failed
+        """
+        print(f"Preprocessing {os.path.basename(file_path)}...")
+        # Failures are handled per file, as for pdfs, so one bad document does not discard the others' results
+        try:
+            return self.rule_partition(file_path)
+        except Exception as e:
+            print(f"Failed to preprocess {os.path.basename(file_path)}: {e}")
+            return None
     
 
+    async def _preprocess_pdfs_async(self, file_paths):
+        """
+        Prerpocesses pdfs concurrently through the Unstructured API
+
+        Parameters:
+        file_paths (list): Filepaths of pdf files
+
+        Returns:
+        list: Unstructured elements of each document (None where the API call failed), in input order
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+        limits = httpx.Limits(max_connections=32)
+        async with httpx.AsyncClient(limits=limits, timeout=UNSTRUCTURED_API_TIMEOUT) as client:
+            return await asyncio.gather(*[self._preprocess_pdf_async(fp, client, semaphore) for fp in file_paths])
+
+    async def _preprocess_pdf_async(self, filepath, client, semaphore):
+        """
+        Prerpocesses pdf to Unstructured Elements by posting it directly to the Unstructured API
+
+        Parameters:
+        filepath (str): Filepath of pdf file
+        client (httpx.AsyncClient): Shared client, so connections are pooled across documents
+        semaphore (asyncio.Semaphore): Limits the number of concurrent uploads
+
+        Returns:
+        list: Unstructured elements of document, or None if the file could not be read or the API call failed
+        """
+        file_name = os.path.basename(filepath)
+        # Failures are handled per file and return None, so one bad document does not discard the others' results
+        try:
+            cache_path = await asyncio.to_thread(self._cache_path, filepath) if self.use_cache else None
+        except OSError as e:
+            print(e)
+            return None
+        element_dicts = await asyncio.to_thread(load_cached_elements, cache_path) if cache_path else None
+        if element_dicts is not None:
+            print(f"Loaded {file_name} from cache.")
+            return await asyncio.to_thread(_elements_from_response, element_dicts, self.chunking)
+
+        async with semaphore:
+            print(f"Preprocessing {file_name}...")
+            try:
+                # The open file is handed to httpx, which streams the multipart body from disk in chunks
+                with open(filepath, "rb") as f:
+                    request = client.build_request(
+                        "POST",
+                        self.server_url,
+                        headers={"unstructured-api-key": self.unstructured_api_key, "accept": "application/json"},
+                        files={"files": (file_name, f, "application/pdf")},
+                        # Form fields carry booleans as "true"/"false"
+                        data={key: str(value).lower() if isinstance(value, bool) else value
+                              for key, value in pdf_partition_params(self.exists_tables).items()},
+                    )
+                    if self.compress_uploads and os.path.getsize(filepath) > COMPRESS_UPLOADS_MIN_BYTES:
+                        # Reading and compressing the whole file is blocking work, so it is kept off the event loop
+                        request = await asyncio.to_thread(self._compress_request, client, request)
+                    resp = await client.send(request)
+                resp.raise_for_status()
+                element_dicts = orjson.loads(resp.content)
+            except (httpx.HTTPError, OSError, orjson.JSONDecodeError) as e:
+                print(e)
+                return None
+
+        if cache_path:
+            await asyncio.to_thread(save_cached_elements, cache_path, element_dicts)
+        # Converting and chunking run on a thread so the event loop keeps serving the other uploads meanwhile
+        return await asyncio.to_thread(_elements_from_response, element_dicts, self.chunking)
+
+    @staticmethod
+    def _compress_request(client, request):
+        """
+        Rebuilds a request with its body zstd-compressed
+
+        Parameters:
+        client (httpx.AsyncClient): Client the request will be sent with
+        request (httpx.Request): Request with a multipart body
+
+        Returns:
+        httpx.Request: The same request with a compressed body and a Content-Encoding: zstd header
+        """
+        body = zstd.ZstdCompressor(level=COMPRESS_UPLOADS_LEVEL).compress(request.read())
+        headers = request.headers.copy()
+        # Content-Length is recomputed from the compressed body
+        del headers["content-length"]
+        headers["content-encoding"] = "zstd"
+        return client.build_request(request.method, request.url, headers=headers, content=body)
+
     def preprocess_pdf(self, filepath, chunking=None):
         """
         Prerpocesses pdf to Unstructured Elements
@@ -125,55 +303,50 @@ class Preprocessing:
         Returns:
         list: Unstructured elements of document
         """
+        # Identical PDFs sent with identical parameters are served from the disk cache
+        cache_path = self._cache_path(filepath) if self.use_cache else None
+        element_dicts = load_cached_elements(cache_path) if cache_path else None
+        if element_dicts is not None:
+            print(f"Loaded {os.path.basename(filepath)} from cache.")
+            return _elements_from_response(element_dicts, self.chunking)
     
         # Create API Client
         s = UnstructuredClient(
             api_key_auth=self.unstructured_api_key,
-            server_url="https://api.unstructuredapp.io/general/v0/general",
+            server_url=self.server_url,
         )
 
-        with open(filepath, "rb") as f:
-            files=shared.Files(
-            content=f.read(), 
-            file_name=filepath,
-            )
-
-        if self.chunking:
-            # Parameters for partitioning pdf
-            req = shared.PartitionParameters(
-                files=files, 
-                strategy="hi_res", 
-                pdf_infer_table_structure=self.exists_tables,
-                languages=["eng"],
-                coordinates=True,
-            )
-        else:
-            # Parameters for partitioning pdf without chunking
-            req = shared.PartitionParameters(
-                files=files, 
-                strategy="hi_res", 
-                pdf_infer_table_structure=self.exists_tables,
-                languages=["eng"], 
-
-                coordinates=True,
-            )
-
         try:
-            resp = s.general.partition(req)
+            # The file handle is passed as the upload content instead of reading the whole pdf into memory first,
+            # so the file is kept open until the request has been sent
+            with open(filepath, "rb") as f:
+                files=shared.Files(
+                content=f, 
+                file_name=filepath,
+                )
+
+                # Parameters for partitioning pdf (chunking is applied locally afterwards)
+                req = shared.PartitionParameters(files=files, **pdf_partition_params(self.exists_tables))
+                resp = s.general.partition(req)
             # print(JSON(json.dumps(resp.elements, indent=2)))
-            elements = dict_to_elements(resp.elements)
-            if self.chunking:
-                elements = chunk_by_title(elements,
-                                            max_characters=1024,
-                                            new_after_n_chars=512,
-                                            include_orig_elements=True,
-                                            multipage_sections=True,
-                                            )
-                return elements
-            # return resp.elements
+            if cache_path:
+                save_cached_elements(cache_path, resp.elements)
+            return _elements_from_response(resp.elements, self.chunking)
         except SDKError as e:
             print(e)
-        
+
+    def _cache_path(self, filepath):
+        """
+        Returns the cache file for a pdf, keyed by its bytes and the partition parameters
+
+        Parameters:
+        filepath (str): Filepath of pdf file
+
+        Returns:
+        str: Path of the cache file
+        """
+        return elements_cache_path(self.cache_dir, filepath, pdf_partition_params(self.exists_tables))
+
     def rule_partition(self, filepath):
         """
         Rule based partitioning
@@ -196,43 +369,58 @@ class Preprocessing:
         
         return elements
     
-    def filter_elements(self, element_types=[], elements = None):
+    def filter_elements(self, element_types=(), elements = None):
+        """
+        Keeps only elements of the given types
+
+        Parameters:
+        element_types (iterable): Element categories to keep (e.g. "Title", "Table"). Keeps everything if empty.
+        elements (dict): {file_name: documentElements} to filter. Defaults to self.preprocessed_outputs.
+
+        Returns:
+        dict(file_name: UnstructuredElements): the filtered elements of each file
+        """
         if elements is None:
             elements = self.preprocessed_outputs
-        if element_types == []:
-            return self.preprocessed_outputs
-        
+        if not element_types:
+            return elements
+        wanted = frozenset(element_types)
+        return {file_name: [e for e in file_elements if e.category in wanted]
+                for file_name, file_elements in elements.items()}
     
-    def show_preprocessed_outputs(self):
+    def show_preprocessed_outputs(self, element_types=()):
+        # Filtering happens while printing, so each document is scanned once
+        wanted = frozenset(element_types)
         for file_name, elements in self.preprocessed_outputs.items():
             print(f"File: {file_name}\n")
-            for i, element in enumerate(elements):
+            i = 0
+            for element in elements:
+                if wanted and element.category not in wanted:
+                    continue
                 print(str(i)+".", element)
+                i += 1
             print("-"*10 + "\n")
     
-    def save_preprocessed_outputs(self, output_folder="elements"):
+    def save_preprocessed_outputs(self, output_folder="elements", element_types=()):
+        os.makedirs(output_folder, exist_ok=True)
+        # Elements not of the given types are skipped while writing, so each document is scanned once
+        wanted = frozenset(element_types)
         for file_name, elements in self.preprocessed_outputs.items():
-            with open(os.path.join(output_folder, "Elements_"+os.path.basename(file_name))+".txt", "w") as f:
-                for i, element in enumerate(elements):
-                    f.write(f"{i}. " + str(element) + "\n\n")
+            output_path = os.path.join(output_folder, "Elements_"+os.path.basename(file_name))
+            # Rows are streamed straight to the csv file rather than collected into a DataFrame first,
+            # while the text dump is assembled in memory and written with a single call
+            parts = []
+            with open(output_path+".csv", "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Type", "Text", "Page"])
+                for element in elements:
+                    if wanted and element.category not in wanted:
+                        continue
+                    parts.append(f"{len(parts)}. {element}\n\n")
+                    writer.writerow([element.category, element.text, element.metadata.page_number])
 
-        for file_name, elements in self.preprocessed_outputs.items():
-            data = []
-            for i, element in enumerate(elements):
-                print(element)
-                print(type(element))
-                row = {}
-                # row["Type"]  = element["type"]
-                # row["ID"] = element["element_id"]
-                # row["Text"] = element["text"]
-                # row["Page"] = element["metadata"]["page_number"]
-                row["Type"]  = element.type
-                # row["ID"] = element.element_id"]
-                row["Text"] = element.text
-                row["Page"] = element.metadata.page_number
-                data.append(row)
-            df = pd.DataFrame(data)
-            df.to_csv(os.path.join(output_folder, "Elements_"+os.path.basename(file_name))+".csv", index=False)
+            with open(output_path+".txt", "w", encoding="utf-8") as f:
+                f.write("".join(parts))
 
 
     
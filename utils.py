@@ -0,0 +1,101 @@
+import os
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+
+
+def run_sync(coro_factory):
+    """
+    Runs a coroutine to completion from synchronous code and returns its result.
+
+    asyncio.run cannot be called while an event loop is already running in this thread
+    (e.g. in Jupyter), so in that case the coroutine runs on a fresh loop in a helper thread.
+
+    Args:
+        coro_factory (callable): Zero-argument callable returning the coroutine to run. The coroutine
+            is only created once it is known which loop it will run on.
+
+    Returns:
+        The coroutine's result.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro_factory())
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(lambda: asyncio.run(coro_factory())).result()
+
+
+# Where Unstructured API results are cached, keyed by a hash of the PDF and request parameters
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "docproc")
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def pdf_partition_params(exists_tables):
+    """
+    Returns the Unstructured API partition parameters used for PDFs (everything except the file).
+    They are also part of the cache key, so every caller sharing the cache must build them here.
+
+    Args:
+        exists_tables (bool): Whether to infer table structure.
+
+    Returns:
+        dict: The partition parameters.
+    """
+    return {
+        "strategy": "hi_res",
+        "pdf_infer_table_structure": exists_tables,
+        "languages": ["eng"],
+        "coordinates": True,
+    }
+
+
+def elements_cache_path(cache_dir, file_path, params):
+    """
+    Returns the cache file for a PDF, named by the SHA-256 of its bytes and the request parameters.
+
+    Args:
+        cache_dir (str): Directory holding the cache.
+        file_path (str): Path of the PDF.
+        params (dict): Partition parameters from pdf_partition_params().
+
+    Returns:
+        str: Path of the cache file.
+    """
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    h.update(repr(sorted(params.items())).encode('utf-8'))
+    return os.path.join(cache_dir, f"{h.hexdigest()}.json")
+
+
+def load_cached_elements(cache_path):
+    """
+    Returns the cached element dicts at cache_path, or None if there is no usable cache entry.
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable cache file {cache_path}: {e}")
+        return None
+
+
+def save_cached_elements(cache_path, element_dicts):
+    """
+    Writes element dicts to cache_path. Written to a temporary file first so concurrent
+    readers never see a partial entry.
+    """
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(element_dicts))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Could not write cache file {cache_path}: {e}")